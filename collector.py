@@ -8,10 +8,15 @@ for downstream processing.
 
 import imaplib
 import email
-import json
 import os
+import re
+import time
+import socket
 from pathlib import Path
 import logging
+import orjson
+
+import storage
 
 try:
     import msvcrt  # Windows-specific module
@@ -21,6 +26,23 @@ except ImportError:
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Upper bound for UIDs per FETCH; larger sets hit server request size limits
+MAX_FETCH_BATCH_SIZE = 100
+UID_PATTERN = re.compile(rb'UID (\d+)')
+# Only the recipient headers are needed to filter out personal emails
+RECIPIENT_HEADERS_FETCH = '(BODY.PEEK[HEADER.FIELDS (TO CC BCC)])'
+FULL_BODY_FETCH = '(BODY.PEEK[])'
+# Number of newly collected UIDs between intermediate config.json writes
+CONFIG_CHECKPOINT_INTERVAL = 50
+# Servers may drop IDLE after 30 minutes (RFC 2177), so re-issue it before that
+IDLE_TIMEOUT = 29 * 60
+# Without IDLE support, poll on this schedule and send NOOP in between
+POLL_INTERVAL = 5 * 60
+NOOP_INTERVAL = 60
+# Backoff bounds, in seconds, between reconnect attempts in daemon mode
+RECONNECT_MIN_DELAY = 5
+RECONNECT_MAX_DELAY = 300
+
 
 def load_config():
     """
@@ -36,8 +58,8 @@ def load_config():
     if not config_path.exists():
         raise FileNotFoundError("config.json file not found!")
     
-    with open(config_path, "r", encoding="utf-8") as config_file:
-        return json.load(config_file)
+    with open(config_path, "rb") as config_file:
+        return orjson.loads(config_file.read())
 
 
 def save_config(config):
@@ -48,27 +70,38 @@ def save_config(config):
         config: Configuration dictionary to save.
     """
     config_path = Path("config.json")
-    with open(config_path, "w", encoding="utf-8") as config_file:
-        json.dump(config, config_file, indent=2)
+    with open(config_path, "wb") as config_file:
+        config_file.write(orjson.dumps(config, option=orjson.OPT_INDENT_2))
+
+
+def get_uid_list(config, key):
+    """
+    Read a list of UIDs from the configuration.
+    
+    Args:
+        config: Configuration dictionary.
+        key: Configuration key holding the UIDs.
+        
+    Returns:
+        List of UID strings. Legacy comma-joined values are split.
+    """
+    uids = config.get(key) or []
+    if isinstance(uids, str):
+        uids = uids.split(",")
+    return [uid for uid in uids if uid]
 
 
 def save_raw_content(uid, raw_content):
     """
-    Save raw email content to disk for later processing.
+    Save raw email content to the content store for later processing.
     
     Args:
         uid: Unique identifier of the email.
         raw_content: Raw email bytes to save.
     """
     try:
-        raw_content_dir = Path("rawcontent")
-        raw_content_dir.mkdir(exist_ok=True)
-        
-        file_path = raw_content_dir / f"{uid}.eml"
-        with open(file_path, "wb") as output_file:
-            output_file.write(raw_content)
-        
-        logger.info(f"Raw content saved: {file_path}")
+        storage.save_raw_content(uid, raw_content)
+        logger.info(f"Raw content saved: {uid}")
     except Exception as error:
         logger.error(f"Error saving raw content: {error}")
 
@@ -93,13 +126,66 @@ def is_personal_email(msg, user_email):
             to_field is None or to_field == "")
 
 
-def collect_unread_emails(mail_connection, config):
+def fetch_emails_in_batches(mail_connection, email_ids, batch_size, message_parts=FULL_BODY_FETCH):
+    """
+    Fetch email data using one UID FETCH per batch of UIDs.
+    
+    Args:
+        mail_connection: Active IMAP connection.
+        email_ids: List of email UIDs as bytes.
+        batch_size: Maximum number of UIDs per FETCH command.
+        message_parts: FETCH data items to request, full body by default.
+        
+    Yields:
+        Tuples of (uid_bytes, fetched_bytes).
+    """
+    for start in range(0, len(email_ids), batch_size):
+        batch = email_ids[start:start + batch_size]
+        status, msg_data = mail_connection.uid('fetch', b','.join(batch), message_parts)
+        if status != 'OK':
+            logger.warning(f"Could not fetch data for Mail IDs {b','.join(batch).decode()}")
+            continue
+
+        # Response interleaves (header, body) tuples with closing b')' entries;
+        # some servers send "UID n" in that closing entry instead of the header
+        for index, response_part in enumerate(msg_data):
+            if not isinstance(response_part, tuple):
+                continue
+            response_header = response_part[0]
+            if index + 1 < len(msg_data) and isinstance(msg_data[index + 1], bytes):
+                response_header += msg_data[index + 1]
+            match = UID_PATTERN.search(response_header)
+            if not match:
+                logger.warning(f"No UID found in FETCH response: {response_header[:100]}")
+                continue
+            yield match.group(1), response_part[1]
+
+
+def mark_emails_seen(mail_connection, email_ids, batch_size):
+    """
+    Set the \\Seen flag using one UID STORE per batch of UIDs.
+    
+    Args:
+        mail_connection: Active IMAP connection.
+        email_ids: List of email UIDs as bytes.
+        batch_size: Maximum number of UIDs per STORE command.
+    """
+    for start in range(0, len(email_ids), batch_size):
+        batch = email_ids[start:start + batch_size]
+        status, _ = mail_connection.uid('STORE', b','.join(batch), '+FLAGS', '\\Seen')
+        if status != 'OK':
+            logger.warning(f"Could not mark Mail IDs {b','.join(batch).decode()} as seen")
+
+
+def collect_unread_emails(mail_connection, config, on_collected=None):
     """
     Collect unread emails from the inbox and save them for processing.
     
     Args:
         mail_connection: Active IMAP connection.
         config: Configuration dictionary with email settings.
+        on_collected: Optional callable invoked with (uid, raw_content)
+            for each newly collected email.
         
     Returns:
         List of newly collected email UIDs.
@@ -110,73 +196,271 @@ def collect_unread_emails(mail_connection, config):
 
     new_emails = []
 
-    # Get collected UIDs as a single line setting
-    collected_uids = config.get("collected_uids", "").split(",")
+    collected_uids = get_uid_list(config, "collected_uids")
+    collected_set = set(collected_uids)
 
+    # UIDs to flag as \Seen, sent together once collection is done
+    seen_ids = []
+    pending_ids = []
     for email_id in email_ids:
-        email_id_str = email_id.decode()
+        if email_id.decode() in collected_set:
+            seen_ids.append(email_id)
+        else:
+            pending_ids.append(email_id)
 
-        if email_id_str in collected_uids:
-            mail_connection.uid('STORE', email_id, '+FLAGS', '\\Seen')
-            continue
+    batch_size = int(config.get("fetch_batch_size", MAX_FETCH_BATCH_SIZE))
+    batch_size = max(1, min(batch_size, MAX_FETCH_BATCH_SIZE))
 
-        status, msg_data = mail_connection.uid('fetch', email_id, '(BODY.PEEK[])')
-        if status != 'OK':
-            logger.warning(f"Could not fetch data for Mail ID {email_id_str}")
-            continue
-
-        email_body = msg_data[0][1]
-        msg = email.message_from_bytes(email_body)
+    # Filter personal emails on headers alone so their bodies are never downloaded
+    newsletter_ids = []
+    for email_id, header_bytes in fetch_emails_in_batches(mail_connection, pending_ids, batch_size,
+                                                          RECIPIENT_HEADERS_FETCH):
+        if not is_personal_email(email.message_from_bytes(header_bytes), config["email"]):
+            newsletter_ids.append(email_id)
 
-        if is_personal_email(msg, config["email"]):
-            continue
+    for email_id, email_body in fetch_emails_in_batches(mail_connection, newsletter_ids, batch_size):
+        email_id_str = email_id.decode()
 
         new_emails.append(email_id_str)
+        collected_uids.append(email_id_str)
+        collected_set.add(email_id_str)
+        config["collected_uids"] = collected_uids
 
-        # Add UID to config.json (single line format)
-        if collected_uids == [""]:
-            collected_uids = [email_id_str]
-        else:
-            collected_uids.append(email_id_str)
-
-        config["collected_uids"] = ",".join(collected_uids)
-        save_config(config)
+        # Checkpoint periodically so a crash does not lose the whole batch
+        if len(new_emails) % CONFIG_CHECKPOINT_INTERVAL == 0:
+            save_config(config)
 
         # Save raw content
         save_raw_content(email_id_str, email_body)
 
-        mail_connection.uid('STORE', email_id, '+FLAGS', '\\Seen')
+        if on_collected:
+            on_collected(email_id_str, email_body)
+
+        seen_ids.append(email_id)
+
+    if len(new_emails) % CONFIG_CHECKPOINT_INTERVAL:
+        save_config(config)
+
+    mark_emails_seen(mail_connection, seen_ids, batch_size)
 
     return new_emails
 
 
+class Collector:
+    """
+    Long-lived collector that keeps a single IMAP connection open between
+    polls and waits for new mail with IMAP IDLE.
+    """
+    
+    def __init__(self, config, on_collected=None):
+        """
+        Initialize the collector.
+        
+        Args:
+            config: Configuration dictionary with email settings.
+            on_collected: Optional callable invoked with (uid, raw_content)
+                for each newly collected email.
+        """
+        self.config = config
+        self.on_collected = on_collected
+        self.mail_connection = None
+    
+    def connect(self):
+        """
+        Open the IMAP connection and log in.
+        """
+        self.mail_connection = imaplib.IMAP4_SSL(self.config["imap_server"])
+        self.mail_connection.login(self.config["email"], self.config["password"])
+        logger.info(f"Connected to {self.config['imap_server']}")
+    
+    def disconnect(self):
+        """
+        Log out and drop the IMAP connection, ignoring errors on dead sockets.
+        """
+        try:
+            if self.mail_connection:
+                self.mail_connection.logout()
+        except Exception:
+            pass
+        finally:
+            self.mail_connection = None
+    
+    def poll(self):
+        """
+        Collect unread emails, reconnecting once if the connection was lost.
+        
+        Returns:
+            List of newly collected email UIDs.
+        """
+        for attempt in range(2):
+            try:
+                if self.mail_connection is None:
+                    self.connect()
+                return collect_unread_emails(self.mail_connection, self.config, self.on_collected)
+            except (imaplib.IMAP4.abort, OSError) as error:
+                self.disconnect()
+                if attempt:
+                    raise
+                logger.warning(f"IMAP connection lost, reconnecting: {error}")
+        return []
+    
+    def read_idle_line(self, timeout):
+        """
+        Read one response line while in IDLE, waiting at most timeout seconds.
+        
+        Args:
+            timeout: Maximum number of seconds to wait.
+            
+        Returns:
+            Response line bytes, or None if the timeout expired.
+            
+        Raises:
+            imaplib.IMAP4.abort: If the server closed the connection.
+        """
+        connection = self.mail_connection
+        previous_timeout = connection.sock.gettimeout()
+        connection.sock.settimeout(timeout)
+        try:
+            # Reads through imaplib's buffered file, so already buffered lines are seen
+            line = connection.readline()
+        except socket.timeout:
+            # A socket file that timed out cannot be read again, so reopen it
+            connection.file.close()
+            connection.file = connection.sock.makefile('rb')
+            return None
+        finally:
+            connection.sock.settimeout(previous_timeout)
+        
+        if not line:
+            raise imaplib.IMAP4.abort("Connection closed during IDLE")
+        return line
+    
+    def wait_for_new_mail(self, timeout):
+        """
+        Block in IMAP IDLE until the server reports new mail or the timeout expires.
+        
+        Args:
+            timeout: Maximum number of seconds to wait.
+            
+        Returns:
+            True if the server reported new mail, False on timeout.
+        """
+        connection = self.mail_connection
+        deadline = time.monotonic() + timeout
+        tag = connection._new_tag()
+        connection.send(tag + b' IDLE\r\n')
+        
+        # Untagged responses such as EXISTS may arrive before the continuation
+        new_mail = False
+        while True:
+            line = self.read_idle_line(max(deadline - time.monotonic(), 1))
+            if line is None:
+                raise imaplib.IMAP4.abort("No response to the IDLE command")
+            if line.startswith(b'+'):
+                break
+            if line.startswith(tag):
+                raise imaplib.IMAP4.error(f"Server rejected the IDLE command: {line.decode(errors='replace').strip()}")
+            if line.rstrip().endswith(b'EXISTS'):
+                new_mail = True
+        
+        try:
+            while not new_mail:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                line = self.read_idle_line(remaining)
+                if line is None:
+                    break
+                if line.rstrip().endswith(b'EXISTS'):
+                    new_mail = True
+            return new_mail
+        finally:
+            connection.send(b'DONE\r\n')
+            # Drain untagged responses until the IDLE command completes
+            while True:
+                line = connection.readline()
+                if not line:
+                    raise imaplib.IMAP4.abort("Connection closed while ending IDLE")
+                if line.startswith(tag):
+                    break
+    
+    def wait_with_noop(self, timeout):
+        """
+        Wait for new mail on servers without IDLE by sending periodic NOOPs.
+        
+        Args:
+            timeout: Maximum number of seconds to wait.
+            
+        Returns:
+            True if a NOOP response reported new mail, False on timeout.
+        """
+        connection = self.mail_connection
+        # Discard the EXISTS count left over from SELECT
+        connection.response('EXISTS')
+        
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            time.sleep(min(NOOP_INTERVAL, remaining))
+            connection.noop()
+            if connection.response('EXISTS')[1] != [None]:
+                return True
+    
+    def run_forever(self):
+        """
+        Poll the inbox, then wait for new mail with IDLE (or NOOP polling on
+        servers without IDLE), indefinitely. Connection errors are retried
+        with exponential backoff.
+        """
+        retry_delay = RECONNECT_MIN_DELAY
+        while True:
+            try:
+                new_emails = self.poll()
+                if new_emails:
+                    logger.info(f"New newsletter emails collected: {', '.join(new_emails)}")
+                
+                if 'IDLE' in self.mail_connection.capabilities:
+                    self.wait_for_new_mail(IDLE_TIMEOUT)
+                else:
+                    self.wait_with_noop(POLL_INTERVAL)
+                retry_delay = RECONNECT_MIN_DELAY
+            except (imaplib.IMAP4.error, OSError) as error:
+                # IMAP4.abort is a subclass of IMAP4.error
+                logger.warning(f"IMAP error, reconnecting in {retry_delay}s: {error}")
+                self.disconnect()
+                time.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, RECONNECT_MAX_DELAY)
+
+
 def main():
     """
     Main entry point for the email collector.
-    Connects to the IMAP server and collects unread newsletter emails.
+    Connects to the IMAP server and collects unread newsletter emails,
+    either once or continuously when daemon_mode is enabled.
     """
-    mail_connection = None
+    collector = None
     try:
         config = load_config()
-        mail_connection = imaplib.IMAP4_SSL(config["imap_server"])
-        mail_connection.login(config["email"], config["password"])
+        collector = Collector(config)
 
-        new_emails = collect_unread_emails(mail_connection, config)
-
-        if new_emails:
-            logger.info(f"New newsletter emails collected: {', '.join(new_emails)}")
+        if config.get("daemon_mode", False):
+            collector.run_forever()
         else:
-            logger.info("No new newsletter emails found.")
+            new_emails = collector.poll()
+
+            if new_emails:
+                logger.info(f"New newsletter emails collected: {', '.join(new_emails)}")
+            else:
+                logger.info("No new newsletter emails found.")
 
     except Exception as error:
         logger.error(f"An error occurred: {error}")
     
     finally:
-        try:
-            if mail_connection:
-                mail_connection.logout()
-        except:
-            pass
+        if collector:
+            collector.disconnect()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,75 @@
+"""
+Pipeline Module
+
+This module runs the collector and processor together, handing each email
+to a pool of processor workers as soon as it is downloaded so that IMAP
+network I/O overlaps with CPU-bound content processing.
+"""
+
+import os
+import logging
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from collector import Collector, load_config
+from processor import collect_processed_uids, get_pdf_settings, process_email_content, save_processed_uids
+
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# Emails allowed in flight per worker before the collector waits for one to finish
+IN_FLIGHT_PER_WORKER = 2
+
+
+def main():
+    """
+    Main entry point for the pipeline.
+    Collects unread newsletter emails and processes them concurrently.
+    """
+    collector = None
+    try:
+        config = load_config()
+        output_dir = "content"
+        os.makedirs(output_dir, exist_ok=True)
+
+        pdf_settings = get_pdf_settings(config)
+        max_workers = config.get("max_workers") or os.cpu_count() or 1
+        pending = {}
+        in_flight = set()
+
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            def submit_email(uid, raw_content):
+                nonlocal in_flight
+                # Backpressure: bound the raw emails queued in the executor
+                if len(in_flight) >= max_workers * IN_FLIGHT_PER_WORKER:
+                    _, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                future = executor.submit(process_email_content, uid, output_dir, pdf_settings, raw_content)
+                pending[uid] = future
+                in_flight.add(future)
+
+            collector = Collector(config, on_collected=submit_email)
+            try:
+                collector.poll()
+            except Exception as error:
+                # Still record the emails that were already handed to workers
+                logger.error(f"Error collecting emails: {error}")
+            finally:
+                collector.disconnect()
+
+            if not pending:
+                logger.info("No new newsletter emails found.")
+
+            processed_uids = collect_processed_uids(pending)
+
+        if processed_uids:
+            save_processed_uids(processed_uids, config)
+
+    except Exception as error:
+        logger.error(f"An error occurred: {error}")
+
+    finally:
+        if collector:
+            collector.disconnect()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,22 +8,52 @@ structured JSON format for the publishing layer.
 
 import os
 import re
+import codecs
 import io
-import json
 import email
-import base64
-import quopri
-import hashlib
 import logging
+import functools
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from PIL import Image
 from pathlib import Path
 from email.header import decode_header
 from email.utils import parseaddr
 from pdf2image import convert_from_path
+import xxhash
+import orjson
+
+from storage import load_raw_content, save_processed_content
 
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Number of pdftoppm processes used to rasterize pages of a single PDF
+PDF_THREAD_COUNT = 4
+# PDF rendering defaults, overridable via pdf_dpi and max_pdf_pages in config.json
+DEFAULT_PDF_DPI = 150
+DEFAULT_MAX_PDF_PAGES = 4
+PDF_JPEG_OPTIONS = {'quality': 85, 'optimize': True, 'progressive': False}
+# Read size used when hashing image files incrementally
+HASH_CHUNK_SIZE = 65536
+# Leading bytes of every JPEG file (SOI marker followed by another marker)
+JPEG_MAGIC = b'\xff\xd8\xff'
+
+LINEBREAK_PATTERN = re.compile(r'[\r\n]+')
+INVALID_FILENAME_CHARS_PATTERN = re.compile(r'[<>:"/\\|?*]')
+
+# Every 7-bit byte, used to detect charsets that are ASCII supersets
+ASCII_PROBE = bytes(range(128))
+
+# UTF-32 BOMs must be checked before UTF-16 since they share a prefix
+BOM_CHARSETS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
 
 def load_config():
     """
@@ -39,8 +69,8 @@ def load_config():
     if not config_path.exists():
         raise FileNotFoundError("config.json file not found!")
     
-    with open(config_path, "r", encoding="utf-8") as config_file:
-        return json.load(config_file)
+    with open(config_path, "rb") as config_file:
+        return orjson.loads(config_file.read())
 
 
 def save_config(config):
@@ -51,32 +81,65 @@ def save_config(config):
         config: Configuration dictionary to save.
     """
     config_path = Path("config.json")
-    with open(config_path, "w", encoding="utf-8") as config_file:
-        json.dump(config, config_file, indent=2)
+    with open(config_path, "wb") as config_file:
+        config_file.write(orjson.dumps(config, option=orjson.OPT_INDENT_2))
 
 
-def save_processed_uid(uid, config):
+def get_uid_list(config, key):
     """
-    Save a processed UID to the configuration file.
+    Read a list of UIDs from the configuration.
     
     Args:
-        uid: Email UID that was processed.
-        config: Configuration dictionary to update.
+        config: Configuration dictionary.
+        key: Configuration key holding the UIDs.
+        
+    Returns:
+        List of UID strings. Legacy comma-joined values are split.
+    """
+    uids = config.get(key) or []
+    if isinstance(uids, str):
+        uids = uids.split(",")
+    return [uid for uid in uids if uid]
+
+
+def save_processed_uids(uids, config):
     """
-    # Get processed UIDs as a single line setting
-    processed_uids = config.get("processed_uids", "")
+    Save processed UIDs to the configuration file with a single write.
     
-    # Split UIDs by comma into a list
-    uid_list = processed_uids.split(",") if processed_uids else []
+    Args:
+        uids: Email UIDs that were processed.
+        config: Configuration dictionary to update.
+    """
+    uid_list = get_uid_list(config, "processed_uids")
+    uid_set = set(uid_list)
 
-    if uid not in uid_list:
-        uid_list.append(uid)
+    for uid in uids:
+        if uid not in uid_set:
+            uid_list.append(uid)
+            uid_set.add(uid)
 
-    # Rejoin UIDs as single line and save to config
-    config["processed_uids"] = ",".join(uid_list)
+    config["processed_uids"] = uid_list
     save_config(config)
 
 
+@functools.lru_cache(maxsize=None)
+def is_ascii_compatible(charset):
+    """
+    Check whether a charset decodes ASCII bytes to the same characters.
+    
+    Args:
+        charset: Charset name.
+        
+    Returns:
+        True for ASCII supersets such as utf-8 or cp1254, False for
+        charsets like utf-16 or utf-7 and for unknown names.
+    """
+    try:
+        return ASCII_PROBE.decode(charset) == ASCII_PROBE.decode('ascii')
+    except (LookupError, UnicodeDecodeError):
+        return False
+
+
 def decode_string(input_bytes, default_charset='utf-8'):
     """
     Decode bytes to string with multiple charset fallbacks.
@@ -93,11 +156,18 @@ def decode_string(input_bytes, default_charset='utf-8'):
     elif input_bytes is None:
         return ''
     
-    charsets = [default_charset, 'utf-8', 'iso-8859-9', 'latin-1', 'cp1254', 'ascii']
+    # Fast paths that avoid raising UnicodeDecodeError on the fallback ladder
+    for bom, charset in BOM_CHARSETS:
+        if input_bytes.startswith(bom):
+            return input_bytes.decode(charset, errors='replace')
+    if input_bytes.isascii() and is_ascii_compatible(default_charset):
+        return input_bytes.decode('ascii')
+    
+    charsets = dict.fromkeys([default_charset, 'utf-8', 'iso-8859-9', 'latin-1', 'cp1254', 'ascii'])
     for charset in charsets:
         try:
             return input_bytes.decode(charset)
-        except (UnicodeDecodeError, AttributeError):
+        except (UnicodeDecodeError, LookupError, AttributeError):
             continue
     
     return input_bytes.decode('utf-8', errors='ignore')
@@ -167,39 +237,44 @@ def decode_sender(msg):
 
 def get_email_content(msg):
     """
-    Extract text, HTML content and attachments from email message.
+    Extract text, HTML content, attachments, images and PDFs from email
+    message in a single pass over its MIME parts.
     
     Args:
         msg: Email message object.
         
     Returns:
-        Tuple of (text_content_list, html_content_list, attachments_list).
+        Tuple of (text_content_list, html_content_list, attachments_list,
+        image_data_list, pdf_attachments_list).
     """
     text_content = []
     html_content = []
     attachments = []
+    images = []
+    pdf_attachments = []
     
     def extract_content(part):
+        content = None
         try:
             content = part.get_payload(decode=True)
-            charset = part.get_content_charset() or 'utf-8'
-            
             if content is None:
                 return
 
-            if part.get('Content-Transfer-Encoding', '').lower() == 'quoted-printable':
-                content = quopri.decodestring(content).decode(charset, errors='ignore')
-            elif part.get('Content-Transfer-Encoding', '').lower() == 'base64':
-                content = base64.b64decode(content)
+            content_type = part.get_content_type()
+            filename = part.get_filename()
             
-            decoded_content = decode_string(content, charset)
+            if content_type.startswith('image/'):
+                images.append(content)
+            elif filename and filename.lower().endswith('.pdf'):
+                pdf_attachments.append((filename, content))
             
-            if part.get_content_type() == 'text/plain':
-                text_content.append(decoded_content)
-            elif part.get_content_type() == 'text/html':
-                html_content.append(decoded_content)
-            elif part.get_filename():
-                attachments.append((part.get_filename(), content))
+            # get_payload(decode=True) has already undone the transfer encoding
+            if content_type == 'text/plain':
+                text_content.append(decode_string(content, part.get_content_charset() or 'utf-8'))
+            elif content_type == 'text/html':
+                html_content.append(decode_string(content, part.get_content_charset() or 'utf-8'))
+            elif filename:
+                attachments.append((filename, content))
         except Exception as error:
             logger.error(f"Error extracting content: {error}")
             logger.error(f"Problematic content: {content[:100] if content else 'Empty content'}...")
@@ -210,7 +285,7 @@ def get_email_content(msg):
     else:
         extract_content(msg)
     
-    return text_content, html_content, attachments
+    return text_content, html_content, attachments, images, pdf_attachments
 
 
 class ImageProcessor:
@@ -219,27 +294,50 @@ class ImageProcessor:
     and PDF page extraction.
     """
     
-    def __init__(self, output_dir: str):
+    def __init__(self, output_dir: str, poppler_path: str = "", pdf_dpi: int = DEFAULT_PDF_DPI,
+                 max_pdf_pages: int = DEFAULT_MAX_PDF_PAGES):
         """
         Initialize the image processor.
         
         Args:
             output_dir: Directory to save processed images.
+            poppler_path: Directory containing the Poppler binaries, empty to use PATH.
+            pdf_dpi: Resolution used when rendering PDF pages.
+            max_pdf_pages: Maximum number of PDF pages to render.
         """
         self.output_dir = output_dir
+        self.poppler_path = poppler_path
+        self.pdf_dpi = pdf_dpi
+        self.max_pdf_pages = max_pdf_pages
         self.processed_hashes = {}
         
     def calculate_image_hash(self, image_data: bytes) -> str:
         """
-        Calculate MD5 hash of image data for deduplication.
+        Calculate xxHash (XXH3 128-bit) of image data for deduplication.
         
         Args:
             image_data: Raw image bytes.
             
         Returns:
-            MD5 hash string.
+            Hex digest string.
         """
-        return hashlib.md5(image_data).hexdigest()
+        return xxhash.xxh3_128(image_data).hexdigest()
+    
+    def calculate_file_hash(self, file_path: str) -> str:
+        """
+        Calculate xxHash of an image file without loading it whole.
+        
+        Args:
+            file_path: Path to the image file.
+            
+        Returns:
+            Hex digest string, identical to calculate_image_hash of the file bytes.
+        """
+        hasher = xxhash.xxh3_128()
+        with open(file_path, 'rb') as image_file:
+            for chunk in iter(lambda: image_file.read(HASH_CHUNK_SIZE), b''):
+                hasher.update(chunk)
+        return hasher.hexdigest()
     
     def process_single_image(self, image_data: bytes, uid: str, index: int, prefix: str):
         """
@@ -261,11 +359,16 @@ class ImageProcessor:
             return self.processed_hashes[image_hash]
             
         try:
-            img = Image.open(io.BytesIO(image_data))
             output_path = os.path.join(self.output_dir, f"{uid}_{prefix}{index}.jpg")
             
-            if img.format != 'JPEG':
-                img = img.convert('RGB')
+            # Already a JPEG: write the bytes through without a decode/re-encode
+            if image_data[:3] == JPEG_MAGIC:
+                with open(output_path, 'wb') as output_file:
+                    output_file.write(image_data)
+                self.processed_hashes[image_hash] = output_path
+                return output_path
+            
+            img = Image.open(io.BytesIO(image_data)).convert('RGB')
             img.save(output_path, 'JPEG')
             
             self.processed_hashes[image_hash] = output_path
@@ -275,6 +378,37 @@ class ImageProcessor:
             logger.error(f"Error processing image: {error}")
             return None
     
+    def process_image_file(self, source_path: str, uid: str, index: int, prefix: str):
+        """
+        Move an already encoded JPEG file into the output directory.
+        
+        Args:
+            source_path: Path to the JPEG file to move.
+            uid: Email UID for filename.
+            index: Image index for filename.
+            prefix: Filename prefix.
+            
+        Returns:
+            Path to saved image, the existing path if already processed,
+            or None on error.
+        """
+        try:
+            image_hash = self.calculate_file_hash(source_path)
+            
+            if image_hash in self.processed_hashes:
+                logger.info(f"This image was already saved: {self.processed_hashes[image_hash]}")
+                return self.processed_hashes[image_hash]
+            
+            output_path = os.path.join(self.output_dir, f"{uid}_{prefix}{index}.jpg")
+            os.replace(source_path, output_path)
+            
+            self.processed_hashes[image_hash] = output_path
+            return output_path
+            
+        except Exception as error:
+            logger.error(f"Error processing image file: {error}")
+            return None
+    
     def process_images(self, images, uid: str, prefix: str = ''):
         """
         Process multiple images.
@@ -309,31 +443,38 @@ class ImageProcessor:
         """
         try:
             logger.info(f"Processing PDF: {file_path}")
-            config = load_config()
-            poppler_path = config.get("poppler_path", "")
-            logger.info(f"Using Poppler path: {poppler_path}")
+            logger.info(f"Using Poppler path: {self.poppler_path}")
             
             if not os.path.exists(file_path):
                 logger.error(f"PDF file not found: {file_path}")
                 return []
             
-            images = convert_from_path(file_path, first_page=1, last_page=4, poppler_path=poppler_path)
-            logger.info(f"Number of pages converted: {len(images)}")
-            
             processed_files = []
             
-            for i, image in enumerate(images):
-                logger.info(f"Processing page {i+1}...")
-                img_buffer = io.BytesIO()
-                image.save(img_buffer, format='JPEG')
-                img_data = img_buffer.getvalue()
+            # Poppler writes JPEG pages straight to disk, skipping a PIL re-encode
+            with tempfile.TemporaryDirectory(dir=self.output_dir) as pages_dir:
+                page_paths = convert_from_path(
+                    file_path,
+                    dpi=self.pdf_dpi,
+                    first_page=1,
+                    last_page=self.max_pdf_pages,
+                    poppler_path=self.poppler_path,
+                    fmt='jpeg',
+                    jpegopt=PDF_JPEG_OPTIONS,
+                    thread_count=PDF_THREAD_COUNT,
+                    output_folder=pages_dir,
+                    paths_only=True
+                )
+                logger.info(f"Number of pages converted: {len(page_paths)}")
                 
-                output_file_path = self.process_single_image(img_data, uid, i, 'pdf_')
-                if output_file_path:
-                    processed_files.append(output_file_path)
-                    logger.info(f"Page {i+1} successfully processed and saved: {output_file_path}")
-                else:
-                    logger.warning(f"Page {i+1} could not be processed or saved.")
+                for i, page_path in enumerate(page_paths):
+                    logger.info(f"Processing page {i+1}...")
+                    output_file_path = self.process_image_file(page_path, uid, i, 'pdf_')
+                    if output_file_path:
+                        processed_files.append(output_file_path)
+                        logger.info(f"Page {i+1} successfully processed and saved: {output_file_path}")
+                    else:
+                        logger.warning(f"Page {i+1} could not be processed or saved.")
             
             logger.info(f"PDF processing complete. Total files processed: {len(processed_files)}")
             return processed_files
@@ -355,35 +496,61 @@ def sanitize_filename(filename):
         Sanitized filename safe for filesystem.
     """
     # Remove or replace invalid characters
-    cleaned = re.sub(r'[\r\n]+', ' ', filename)  # Replace line breaks with spaces
-    cleaned = re.sub(r'[<>:"/\\|?*]', '_', cleaned)  # Replace other invalid chars with underscore
+    cleaned = LINEBREAK_PATTERN.sub(' ', filename)  # Replace line breaks with spaces
+    cleaned = INVALID_FILENAME_CHARS_PATTERN.sub('_', cleaned)  # Replace other invalid chars with underscore
     cleaned = cleaned.strip()  # Remove leading/trailing whitespace
     return cleaned if cleaned else "nameless"  # Return default name if empty
 
 
-def process_email_content(uid, output_dir):
+def get_pdf_settings(config):
+    """
+    Extract the PDF rendering settings from the configuration.
+    
+    Only these few values are handed to worker processes, so the growing
+    UID lists in the configuration are not pickled for every email.
+    
+    Args:
+        config: Configuration dictionary.
+        
+    Returns:
+        Dictionary of ImageProcessor keyword arguments.
+    """
+    return {
+        'poppler_path': config.get("poppler_path", ""),
+        'pdf_dpi': config.get("pdf_dpi", DEFAULT_PDF_DPI),
+        'max_pdf_pages': config.get("max_pdf_pages", DEFAULT_MAX_PDF_PAGES)
+    }
+
+
+def process_email_content(uid, output_dir, pdf_settings, raw_content=None):
     """
     Process email content from raw storage and extract all data.
     
     Args:
         uid: Email UID to process.
         output_dir: Directory to save processed content.
+        pdf_settings: PDF rendering settings from get_pdf_settings.
+        raw_content: Raw email bytes; read from raw storage when omitted.
         
     Returns:
         List of processed file paths.
     """
-    raw_content_dir = Path("rawcontent")
-    raw_content_path = raw_content_dir / f"{uid}.eml"
-    
-    if not raw_content_path.exists():
-        logger.warning(f"Raw content not found: {raw_content_path}")
-        return []
+    if raw_content is None:
+        raw_content = load_raw_content(uid)
     
-    with open(raw_content_path, 'rb') as input_file:
-        raw_content = input_file.read()
+    if raw_content is None:
+        # Emails collected before the content store existed live in rawcontent/
+        raw_content_path = Path("rawcontent") / f"{uid}.eml"
+        
+        if not raw_content_path.exists():
+            logger.warning(f"Raw content not found: {uid}")
+            return []
+        
+        with open(raw_content_path, 'rb') as input_file:
+            raw_content = input_file.read()
     
     msg = email.message_from_bytes(raw_content)
-    image_processor = ImageProcessor(output_dir)
+    image_processor = ImageProcessor(output_dir, **pdf_settings)
     processed_files = []
     
     sender = decode_sender(msg)
@@ -391,59 +558,84 @@ def process_email_content(uid, output_dir):
     date = msg.get("Date", "")
     subject = decode_subject(msg)
     
-    text_contents, html_contents, attachments = get_email_content(msg)
+    text_contents, html_contents, attachments, images, pdf_attachments = get_email_content(msg)
     
     # Process images and PDFs
-    for part in msg.walk():
-        if part.get_content_maintype() == 'image':
-            content = part.get_payload(decode=True)
-            processed_file = image_processor.process_single_image(content, uid, len(processed_files), 'img_')
-            if processed_file:
-                processed_files.append(processed_file)
-                
-        elif part.get_filename() and part.get_filename().lower().endswith('.pdf'):
-            original_filename = part.get_filename()
-            sanitized_filename = sanitize_filename(original_filename)
-            temp_pdf_path = os.path.join(output_dir, f"temp_{sanitized_filename}")
-            
-            logger.info(f"Processing PDF file: {original_filename}")
-            logger.info(f"Sanitized filename: {sanitized_filename}")
+    for image_data in images:
+        processed_file = image_processor.process_single_image(image_data, uid, len(processed_files), 'img_')
+        if processed_file:
+            processed_files.append(processed_file)
+    
+    for original_filename, pdf_data in pdf_attachments:
+        sanitized_filename = sanitize_filename(original_filename)
+        # UID prefix keeps temp files unique across parallel workers
+        temp_pdf_path = os.path.join(output_dir, f"temp_{uid}_{sanitized_filename}")
+        
+        logger.info(f"Processing PDF file: {original_filename}")
+        logger.info(f"Sanitized filename: {sanitized_filename}")
+        
+        try:
+            with open(temp_pdf_path, 'wb') as temp_file:
+                temp_file.write(pdf_data)
             
-            try:
-                with open(temp_pdf_path, 'wb') as temp_file:
-                    temp_file.write(part.get_payload(decode=True))
-                
-                processed_files.extend(image_processor.process_pdf(temp_pdf_path, uid))
-            except Exception as error:
-                logger.error(f"Error processing PDF file: {error}")
-            finally:
-                if os.path.exists(temp_pdf_path):
-                    try:
-                        os.remove(temp_pdf_path)
-                    except Exception as error:
-                        logger.error(f"Error deleting temporary PDF file: {error}")
+            processed_files.extend(image_processor.process_pdf(temp_pdf_path, uid))
+        except Exception as error:
+            logger.error(f"Error processing PDF file: {error}")
+        finally:
+            if os.path.exists(temp_pdf_path):
+                try:
+                    os.remove(temp_pdf_path)
+                except Exception as error:
+                    logger.error(f"Error deleting temporary PDF file: {error}")
     
     # Save processed content as JSON
-    content_dir = Path(output_dir)
-    content_dir.mkdir(exist_ok=True)
-    
-    json_file_path = content_dir / f"{uid}.json"
-    with open(json_file_path, "w", encoding="utf-8") as output_file:
-        json.dump({
-            'sender': sender,
-            'recipient': recipient,
-            'date': date,
-            'subject': subject,
-            'text_contents': text_contents,
-            'html_contents': html_contents,
-            'attachments': [name for name, _ in attachments],
-            'processed_files': processed_files
-        }, output_file, ensure_ascii=False, indent=2)
-    
-    logger.info(f"Processed content saved: {json_file_path}")
+    save_processed_content(uid, orjson.dumps({
+        'sender': sender,
+        'recipient': recipient,
+        'date': date,
+        'subject': subject,
+        'text_contents': text_contents,
+        'html_contents': html_contents,
+        'attachments': [name for name, _ in attachments],
+        'processed_files': processed_files
+    }))
+    
+    logger.info(f"Processed content saved: {uid}")
     return processed_files
 
 
+def collect_processed_uids(futures):
+    """
+    Wait for process_email_content futures and gather the UIDs that produced files.
+    
+    Errors are logged per UID so one failing email does not discard the others.
+    
+    Args:
+        futures: Dictionary mapping email UIDs to process_email_content futures.
+        
+    Returns:
+        List of UIDs that were processed successfully.
+    """
+    processed_uids = []
+    
+    for uid, future in futures.items():
+        try:
+            processed_files = future.result()
+        except Exception as error:
+            logger.error(f"Error processing UID {uid}: {error}")
+            continue
+
+        if processed_files:
+            logger.info(f"Processed files for UID {uid}: {', '.join(processed_files)}")
+            processed_uids.append(uid)
+        else:
+            logger.warning(f"No attachments found for UID {uid}, skipping processing.")
+        
+        logger.info("-" * 100)
+    
+    return processed_uids
+
+
 def main():
     """
     Main entry point for the content processor.
@@ -454,22 +646,22 @@ def main():
         output_dir = "content"
         os.makedirs(output_dir, exist_ok=True)
 
-        email_uids = config.get("collected_uids", "").split(",")
+        email_uids = get_uid_list(config, "collected_uids")
 
-        for uid in email_uids:
-            if not uid.strip():
-                logger.warning("Skipping empty UID.")
-                continue
+        logger.info(f"Processing {len(email_uids)} UIDs...")
 
-            logger.info(f"Processing UID {uid}...")
-            processed_files = process_email_content(uid, output_dir)
-            if processed_files:
-                logger.info(f"Processed files: {', '.join(processed_files)}")
-                save_processed_uid(uid, config)
-            else:
-                logger.warning(f"No attachments found for UID {uid}, skipping processing.")
-            
-            logger.info("-" * 100)
+        pdf_settings = get_pdf_settings(config)
+
+        # Each email is independent CPU-bound work (PDF rasterizing, JPEG encoding)
+        with ProcessPoolExecutor(max_workers=config.get("max_workers")) as executor:
+            futures = {
+                uid: executor.submit(process_email_content, uid, output_dir, pdf_settings)
+                for uid in email_uids
+            }
+            processed_uids = collect_processed_uids(futures)
+
+        if processed_uids:
+            save_processed_uids(processed_uids, config)
 
     except Exception as error:
         logger.error(f"Error during main processing: {error}")
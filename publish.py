@@ -2,51 +2,67 @@
 Content Publisher Module
 
 This module provides Twitter API integration for publishing processed content.
-Currently implements Twitter v1.1 API using tweepy library.
+Currently implements Twitter API v2 using tweepy library.
 
 Note: This is a basic implementation. For production use, implement proper
-error handling, rate limiting, and consider migrating to Twitter API v2.
+error handling and rate limiting.
 """
 
+from pathlib import Path
+
+import orjson
 import tweepy
 
-# Twitter API credentials
-# WARNING: Move these to config.json for security
-API_KEY = 'your-api-key'
-API_SECRET_KEY = 'your-api-secret-key'
-ACCESS_TOKEN = 'your-access-token'
-ACCESS_TOKEN_SECRET = 'your-access-token-secret'
+
+def load_config():
+    """
+    Load configuration from a JSON file.
+    
+    Returns:
+        Dictionary containing configuration parameters.
+        
+    Raises:
+        FileNotFoundError: If config.json does not exist.
+    """
+    config_path = Path("config.json")
+    if not config_path.exists():
+        raise FileNotFoundError("config.json file not found!")
+    
+    with open(config_path, "rb") as config_file:
+        return orjson.loads(config_file.read())
 
 
-def authenticate_twitter():
+def authenticate_twitter(config):
     """
-    Authenticate with Twitter API using OAuth 1.0a.
+    Authenticate with Twitter API v2 using OAuth 1.0a user context.
     
+    Args:
+        config: Configuration dictionary with Twitter credentials.
+        
     Returns:
-        Authenticated tweepy API object.
+        Authenticated tweepy Client object.
     """
-    auth = tweepy.OAuth1UserHandler(
-        API_KEY, 
-        API_SECRET_KEY, 
-        ACCESS_TOKEN, 
-        ACCESS_TOKEN_SECRET
+    return tweepy.Client(
+        consumer_key=config["twitter_api_key"],
+        consumer_secret=config["twitter_api_secret"],
+        access_token=config["twitter_access_token"],
+        access_token_secret=config["twitter_access_token_secret"]
     )
-    return tweepy.API(auth)
 
 
-def post_tweet(api, message):
+def post_tweet(client, message):
     """
     Post a tweet to Twitter.
     
     Args:
-        api: Authenticated tweepy API object.
+        client: Authenticated tweepy Client object.
         message: Tweet text to post (max 280 characters).
         
     Returns:
         True if successful, False otherwise.
     """
     try:
-        api.update_status(status=message)
+        client.create_tweet(text=message)
         print("Tweet posted successfully!")
         return True
     except tweepy.TweepyException as error:
@@ -59,11 +75,12 @@ def main():
     Main entry point for the publisher.
     Authenticates and posts a test tweet.
     """
-    api = authenticate_twitter()
+    config = load_config()
+    client = authenticate_twitter(config)
     
     # Example tweet
     tweet_message = "Hello, world! This is an automated tweet from my script."
-    post_tweet(api, tweet_message)
+    post_tweet(client, tweet_message)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,93 @@
+"""
+Content Storage Module
+
+This module keeps raw email bytes and processed JSON payloads in a single
+SQLite database (WAL mode) instead of one file per email UID, shared by the
+collector and processor.
+"""
+
+import os
+import sqlite3
+from pathlib import Path
+
+STORE_PATH = Path("store.db")
+
+_connection = None
+_connection_pid = None
+# Connections inherited across fork; kept referenced so they are never closed in the child
+_inherited_connections = []
+
+
+def get_store():
+    """
+    Return this process's connection to the content store, opening it on first use.
+    
+    Connections are not shared across fork, so worker processes open their own.
+    
+    Returns:
+        sqlite3.Connection in autocommit mode.
+    """
+    global _connection, _connection_pid
+
+    if _connection is None or _connection_pid != os.getpid():
+        if _connection is not None:
+            # SQLite forbids using (even closing) a connection after fork
+            _inherited_connections.append(_connection)
+        _connection = sqlite3.connect(STORE_PATH, isolation_level=None, timeout=30)
+        _connection.execute("PRAGMA journal_mode=WAL")
+        _connection.execute("PRAGMA synchronous=NORMAL")
+        _connection.execute("CREATE TABLE IF NOT EXISTS raw (uid TEXT PRIMARY KEY, body BLOB NOT NULL)")
+        _connection.execute("CREATE TABLE IF NOT EXISTS processed (uid TEXT PRIMARY KEY, payload BLOB NOT NULL)")
+        _connection_pid = os.getpid()
+
+    return _connection
+
+
+def save_raw_content(uid, raw_content):
+    """
+    Store raw email bytes.
+    
+    Args:
+        uid: Unique identifier of the email.
+        raw_content: Raw email bytes to store.
+    """
+    get_store().execute("INSERT OR REPLACE INTO raw (uid, body) VALUES (?, ?)", (uid, raw_content))
+
+
+def load_raw_content(uid):
+    """
+    Load raw email bytes.
+    
+    Args:
+        uid: Unique identifier of the email.
+    
+    Returns:
+        Raw email bytes, or None if the UID is not stored.
+    """
+    row = get_store().execute("SELECT body FROM raw WHERE uid = ?", (uid,)).fetchone()
+    return row[0] if row else None
+
+
+def save_processed_content(uid, payload):
+    """
+    Store a processed content payload.
+    
+    Args:
+        uid: Unique identifier of the email.
+        payload: Serialized JSON bytes.
+    """
+    get_store().execute("INSERT OR REPLACE INTO processed (uid, payload) VALUES (?, ?)", (uid, payload))
+
+
+def load_processed_content(uid):
+    """
+    Load a processed content payload.
+    
+    Args:
+        uid: Unique identifier of the email.
+    
+    Returns:
+        Serialized JSON bytes, or None if the UID is not stored.
+    """
+    row = get_store().execute("SELECT payload FROM processed WHERE uid = ?", (uid,)).fetchone()
+    return row[0] if row else None